@@ -1,4 +1,6 @@
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time
 import fnmatch
 from lxml import etree
 import logging
@@ -10,7 +12,7 @@ import yaml
 from yaml.constructor import SafeConstructor
 
 from .schema import *
-from .schema import _wrapper, _schema
+from .schema import _indented, _wrapper, _schema
 
 class CCVError(Exception):
     pass
@@ -23,6 +25,33 @@ def _add_bool(self, node):
 
 SafeConstructor.add_constructor(u'tag:yaml.org,2002:bool', _add_bool)
 
+# Standard library TOML parser is considerably faster, but only from 3.11
+try:
+    from tomllib import loads as _parse_toml
+except ImportError:
+    _parse_toml = tomlkit.parse
+
+def _toml_dates(value):
+    """Convert TOML dates and times to ISO strings (for either parser)"""
+
+    if isinstance(value, dict):
+        return {key: _toml_dates(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [_toml_dates(item) for item in value]
+    elif isinstance(value, (date, time)):
+        return value.isoformat()
+    else:
+        return value
+
+# Reading files is separated out so that it can be done in parallel
+def _read_file(path):
+
+    f = open(path)
+    with f:
+        content = f.read()
+
+    return content
+
 # Setting up logger
 def _add_logger():
     logger = logging.getLogger("CCV")
@@ -68,8 +97,7 @@ class CCV(object):
             for _, section_xml in etree.iterwalk(xml, tag = "section"):
 
                 # If any parents have fields, do not move
-                section = XML(section_xml, language)
-                section = Section(section.id)
+                section = Section(section_xml.get("id"))
 
                 if section.is_container:
                     self.get_container(section)
@@ -88,30 +116,27 @@ class CCV(object):
         if content is None:
             content = {}
 
-        entry = XML(xml, self.language)
-        entry = Section(entry.id)
+        entry = Section(xml.get("id"))
 
         for field_xml in xml.iterchildren("field"):
 
-            field = XML(field_xml, self.language)
-            field = Field(field.id)
+            field = Field(field_xml.get("id"))
 
             # Bilingual and Reference require special parsing
-            xml_children = field_xml.getchildren()
-            if len(xml_children) == 0:
+            if len(field_xml) == 0:
                 wrn = '"%s" does not have a value, ignoring.'
                 self.log.warning(wrn, field.label)
                 continue
             elif field.type.label == "Reference":
-                reference = xml_children[0].getchildren()[-1]
+                reference = field_xml[0][-1]
                 value = field.reference.get_value(reference.get("value"))
                 value = value.label
             elif field.type.label == "Bilingual":
                 value = {}
-                for component_xml in xml_children[1].getchildren():
+                for component_xml in field_xml[1]:
                     value[component_xml.tag] = component_xml.text
             else:
-                value = field_xml.getchildren()[0].text
+                value = field_xml[0].text
 
             if value is None:
                 value = ""
@@ -120,8 +145,7 @@ class CCV(object):
         # Most sections, the question is whether there is one or multiple
         for section_xml in xml.iterchildren("section"):
 
-            section = XML(section_xml, self.language)
-            section = Section(section.id)
+            section = Section(section_xml.get("id"))
 
             if section.label in content:
 
@@ -153,7 +177,7 @@ class CCV(object):
             parent = self._content
 
         # Add new section to content and index
-        if len(section.fields) > 0 and not section.is_dependent:
+        if section.has_fields and not section.is_dependent:
             parent[section.label] = container = []
         else:
             parent[section.label] = container = {}
@@ -173,7 +197,7 @@ class CCV(object):
             out[field] = ""      
 
         # Basic parsing cleanup
-        for entry in list(entries.keys()):
+        for entry in entries:
 
             value = entries[entry]
 
@@ -239,10 +263,10 @@ class CCV(object):
         # First, determine what section this is
         if section is None:
             try:
-                section = Section.from_entries(list(entries.keys()))
+                section = Section.from_entries(entries)
             except SchemaError as e:
                 self.log.warning(e)
-                section = Section.from_entries(list(entries.keys()), error = False)
+                section = Section.from_entries(entries, error = False)
 
         # If section is none, then we are at the root, and it would be easier
         # to iterate through each component manually
@@ -275,11 +299,9 @@ class CCV(object):
 
         # If the section is in itself a container, add entries individually
         if section.is_container:
-            keys = [i for i in entries.keys()]
-
-            for key in keys:
+            for key, value in entries.items():
                 subsection = Section(key, section.label)
-                self.add_content(entries[key], section = subsection, validate = validate)
+                self.add_content(value, section = subsection, validate = validate)
 
         else:
 
@@ -376,9 +398,9 @@ class CCV(object):
             
             schema, content = entry
 
-            # If we are dealing with a field, just append xml to parent
+            # If we are dealing with a field, just add xml to parent
             if isinstance(schema, Field):
-                xml.append(schema.to_xml(content))
+                schema.to_xml_into(xml, content)
 
             # Otherwise, initialize new container and fill it
             elif isinstance(schema, Section):
@@ -398,7 +420,6 @@ class CCV(object):
     def content_to_yaml(self, yaml, entries, **kwargs):
 
         global _wrapper
-        wrapper = copy.deepcopy(_wrapper)
 
         # Unpacking kwargs
         defaults = {
@@ -415,8 +436,11 @@ class CCV(object):
         prefix1 = prefix
         prefix2 = ' ' * len(prefix) 
 
-        wrapper.initial_indent = indent1 * indent + prefix1
-        wrapper.subsequent_indent = indent2 * indent + prefix2
+        wrapper = _indented(
+            _wrapper,
+            indent1 * indent + prefix1,
+            indent2 * indent + prefix2,
+        )
 
         # Otherwise, generate new parents
         for entry in entries:
@@ -476,21 +500,30 @@ class CCV(object):
             self.add_file(path)
             return
 
+        paths = []
         for root, dirs, files in os.walk(path):
             for name in files:
                 name = os.path.join(root, name)
                 if path_check(name):
-                    self.add_file(name)
+                    paths.append(name)
+
+        # Reading is I/O bound and can be done in parallel, but the content
+        # itself has to be added one file at a time (in order, as soon as
+        # each file has been read)
+        with ThreadPoolExecutor() as executor:
+            contents = executor.map(_read_file, paths)
+
+            for name, content in zip(paths, contents):
+                self.add_file(name, content)
 
     #----------------------------------------
-    def add_file(self, path):
-        """Add contents of a single file"""
+    def add_file(self, path, content = None):
+        """Add contents of a single file (reading it if content not provided)"""
 
         self.log.info("## Parsing %s ##", os.path.basename(path))
 
-        f = open(path)
-        with f:
-            content = f.read()
+        if content is None:
+            content = _read_file(path)
         
         if len(content) < 1:
             self.log.info("No content found, ignoring...")
@@ -513,7 +546,7 @@ class CCV(object):
     def add_toml(self, text):
         """Add contents of TOML formatted string"""
 
-        self.add_content(tomlkit.parse(text))
+        self.add_content(_toml_dates(_parse_toml(text)))
 
     #---------------------------------------------------------------------------
     # User functions for output
@@ -532,7 +565,7 @@ class CCV(object):
 
         # Bilingual fields are structured extremely weird and have to be post-processed
         for _, field_xml in etree.iterwalk(xml, tag = "field"):
-            child = list(field_xml)[0]
+            child = field_xml[0]
             if child.get("type") == "Bilingual":
                 english = child[0].text
                 french = child[1].text
@@ -541,11 +574,9 @@ class CCV(object):
                 child.remove(child[0])
                 child.text = english
 
-                field_xml.append(etree.Element("bilingual"))
-                field_xml[1].append(etree.Element("french"))
-                field_xml[1][0].text = french
-                field_xml[1].append(etree.Element("english"))
-                field_xml[1][1].text = english
+                bilingual = etree.SubElement(field_xml, "bilingual")
+                etree.SubElement(bilingual, "french").text = french
+                etree.SubElement(bilingual, "english").text = english
 
 
         if not path.endswith(".xml"):
@@ -562,7 +593,7 @@ class CCV(object):
 
         # Prevent wrapping from losing information
         global _wrapper
-        wrapper = copy.deepcopy(_wrapper)
+        wrapper = copy.copy(_wrapper)
         wrapper.max_lines = 100
 
         if len(args) == 0:
@@ -1,17 +1,23 @@
-from cached_property import cached_property
+from collections import defaultdict
 import copy
 from datetime import datetime
-from flatten_dict import flatten
+import functools
 import importlib.resources
 import locale
 import logging
 from lxml import etree
 import operator
 import re
+import sys
 from textwrap import TextWrapper
 
 locale.setlocale(locale.LC_ALL, "")
 
+# Labels are drawn from a fixed schema, so collation keys are reused (the
+# keys depend on LC_COLLATE, so the cache is cleared in load_schema and has
+# to be cleared again if the locale is changed after that)
+_strxfrm = functools.lru_cache(maxsize = 8192)(locale.strxfrm)
+
 
 class SchemaError(Exception):
     """Raised when there is a generic issue parsing CCV data"""
@@ -19,6 +25,45 @@ class SchemaError(Exception):
     pass
 
 
+# ==============================================================================
+# Regular expressions used in parsing schema labels and values
+
+# Reference table headers take the form of "Label (Table Type)"
+_RE_LABEL_TYPE = re.compile(r".*?\((.*?)\).*")
+_RE_LABEL_STRIP = re.compile(r"[ ]*\(.*?\)")
+
+# Single newlines (along with surrounding whitespace) are collapsed in values
+_RE_NEWLINE = re.compile(r"[ \t]*\n{1}[ \t]*")
+
+# Ids of all enclosing sections (in document order, outermost first)
+_XPATH_PARENT_IDS = etree.XPath("ancestor::section/@id")
+
+
+# ==============================================================================
+# Lockless alternative to functools.cached_property (schema is not shared
+# across threads during construction, so a plain instance __dict__ write will do)
+
+class _cached_property(object):
+
+    def __init__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner = None):
+
+        if instance is None:
+            return self
+
+        # Stored value shadows this (non-data) descriptor from now on, so it
+        # can only be used on classes whose instances have a __dict__
+        value = instance.__dict__[self.name] = self.func(instance)
+
+        return value
+
+
 # ==============================================================================
 # Helper function for line wrapping in template
 
@@ -37,96 +82,160 @@ def load_wrapper(wrapper = None):
     global _wrapper
     _wrapper = wrapper
 
+# TextWrapper settings (other than indents) that identify an indented copy
+_WRAPPER_SETTINGS = (
+    "width", "expand_tabs", "tabsize", "replace_whitespace",
+    "fix_sentence_endings", "break_long_words", "drop_whitespace",
+    "break_on_hyphens", "max_lines", "placeholder",
+)
+
+def _indented(wrapper, initial_indent, subsequent_indent):
+    """Shared wrapper with the settings of wrapper and new indents (must not
+    be modified)"""
+
+    settings = tuple(getattr(wrapper, name) for name in _WRAPPER_SETTINGS)
+
+    return _indented_wrapper(
+        type(wrapper), settings, initial_indent, subsequent_indent
+    )
+
+@functools.lru_cache(maxsize = 256)
+def _indented_wrapper(class_, settings, initial_indent, subsequent_indent):
+
+    # Keyed on settings rather than the wrapper itself, so that callers'
+    # wrappers are neither shared nor kept alive by the cache
+    return class_(
+        initial_indent = initial_indent,
+        subsequent_indent = subsequent_indent,
+        **dict(zip(_WRAPPER_SETTINGS, settings))
+    )
+
 
 # ==============================================================================
 # Function dealing with general schema creation
 
-_schema = {}
+class _Registry(object):
+    """
+    Flat lookup table of schema elements keyed on (class, *keys) tuples. Partial
+    keys (e.g. section label without parent label) are indexed separately to
+    allow lookup by leading identifiers as long as they are unambiguous.
+    """
 
-# ----------------------------------------
-def _add_schema(class_, keys, value, unique = True, overwrite = False):
+    # ----------------------------------------
+    def __init__(self):
 
-    # If overwrite is true, makes no sense to error out on unique check
-    if overwrite:
-        unique = False
+        self.clear()
 
-    global _schema
+    # ----------------------------------------
+    def clear(self):
 
-    name = "-".join(keys)
-    keys = [class_] + keys.copy()
+        self._exact = {}
+        self._partial = {}
+        self._classes = set()
 
-    lookup = _schema
+        # Top level sections and sets of section ids by child entry label
+        self.root = {}
+        self.entries = {}
 
-    while len(keys) > 1:
-        key = keys.pop(0)
+        # The same sets encoded as integer bitmaps over a dense section index
+        self.entry_bits = {}
+        self.section_ids = []
 
-        if key not in lookup:
-            lookup[key] = {}
-        lookup = lookup[key]
+    # ----------------------------------------
+    def add(self, class_, keys, value, unique = True, overwrite = False):
 
-    key = keys.pop()
+        # If overwrite is true, makes no sense to error out on unique check
+        if overwrite:
+            unique = False
 
-    if key in lookup:
-        if unique:
-            err = '"{}" is not unique in "{}"'
-            err = err.format(name, class_)
-            raise SchemaError(err)
-        elif overwrite:
-            lookup[key] = value
-    else:
-        lookup[key] = value
+        # Keys are interned as the same identifiers are looked up repeatedly
+        key = (class_, *map(sys.intern, keys))
 
+        if key in self._exact:
+            if unique:
+                err = '"{}" is not unique in "{}"'
+                err = err.format("-".join(keys), class_)
+                raise SchemaError(err)
+            elif overwrite:
+                self._exact[key] = value
 
-# ----------------------------------------
-def _get_schema(class_, keys):
+            return
 
-    global _schema
+        self._exact[key] = value
+        self._classes.add(class_)
 
-    name = "-".join(keys)
-    keys = keys.copy()
+        # Indexing leading subsets of keys
+        for i in range(2, len(key)):
+            self._partial.setdefault(key[:i], []).append(key)
 
-    if class_ not in _schema:
-        err = 'No schema found for "{}" class'
-        err = err.format(class_)
-        raise SchemaError(err)
+    # ----------------------------------------
+    def get(self, class_, keys):
 
-    lookup = _schema[class_]
+        key = (class_, *keys)
 
-    while len(keys) > 0:
-        key = keys.pop(0)
+        if key in self._exact:
+            return self._exact[key]
 
-        if key not in lookup:
-            err = 'No schema found for "{}" class with identifier "{}"'
-            err = err.format(class_, name)
+        if class_ not in self._classes:
+            err = 'No schema found for "{}" class'
+            err = err.format(class_)
             raise SchemaError(err)
 
-        lookup = lookup[key]
+        matches = self._partial.get(key)
 
-    # If the result is still a dictionary, flatten it to see if there
-    # is just one nested key
-    if isinstance(lookup, dict):
-        flat = flatten(lookup)
-        keys = list(flat.keys())
+        if matches is None:
+            err = 'No schema found for "{}" class with identifier "{}"'
+            err = err.format(class_, "-".join(keys))
+            raise SchemaError(err)
 
-        if len(keys) == 1:
-            return flat[keys[0]]
-        else:
+        if len(matches) > 1:
             err = 'Identifier "{}" is ambiguous for class "{}". '
-            err = err.format(name, class_)
+            err = err.format("-".join(keys), class_)
 
             if class_ == "Section":
                 err = err + " Try adding parent section label."
 
             raise SchemaError(err)
 
-    return lookup
+        return self._exact[matches[0]]
+
+    # ----------------------------------------
+    def ids_from_bits(self, bits):
+        """Section ids corresponding to the set bits of a bitmap"""
+
+        section_ids = self.section_ids
+        ids = []
+
+        while bits:
+            low = bits & -bits
+            ids.append(section_ids[low.bit_length() - 1])
+            bits ^= low
+
+        return frozenset(ids)
+
+    # ----------------------------------------
+    def by_id(self, class_, id_):
+        """Direct lookup by schema id, skipping partial key resolution"""
+
+        try:
+            return self._exact[(class_, id_)]
+        except KeyError:
+            return self.get(class_, (id_,))
+
+
+_schema = _Registry()
+
+# Schema files are only walked element by element, so whitespace between
+# elements and xml:id indexing are of no use
+_parser = etree.XMLParser(remove_blank_text = True, collect_ids = False)
 
 # ----------------------------------------
 def _read_xml(path, default):
 
     if path is None:
         
-        content = importlib.resources.read_binary('canadianccv', default)
+        resource = importlib.resources.files('canadianccv').joinpath(default)
+        content = resource.read_bytes()
     
     else:
 
@@ -134,93 +243,108 @@ def _read_xml(path, default):
         with f:
             content = f.read()
     
-    return etree.XML(content)
+    return etree.XML(content, _parser)
 
 
 # ----------------------------------------
 def load_schema(language="english", cv = None, lov = None, ref = None):
 
-    global _schema
-
-    _schema["Root"] = {}
+    _schema.clear()
+    Rule.from_id.cache_clear()
+    Section._match_entries.cache_clear()
+    _strxfrm.cache_clear()
 
     cv = _read_xml(cv, "cv.xml")
     lov = _read_xml(lov, "cv-lov.xml")
     ref = _read_xml(ref, "cv-ref-table.xml")
 
-    # Section lookup tables
-    for _, xml in etree.iterwalk(cv, tag = "section"):
+    # Section ids (as sets and bitmaps) by child entry label
+    entry_sets = defaultdict(set)
+    entry_bits = defaultdict(int)
+    section_ids = _schema.section_ids
+
+    # Sections, data types and rules in a single pass over the cv schema
+    for _, xml in etree.iterwalk(cv, tag = ("section", "type", "rule")):
+
+        if xml.tag == "type":
+
+            entry = Type.from_xml(xml, language)
+            _schema.add("Type", [entry.id], entry)
+            _schema.add("Type", [entry.label], entry)
+            continue
 
-        section = Section(xml = xml, language = language)
-        _add_schema("Section", [section.id], section)
-        _add_schema("Section", [section.label, str(section.parent_label)], section)
+        if xml.tag == "rule":
 
-        if section.parent_label is None:
-            _schema["Root"][section.label] = section 
+            entry = Rule.from_xml(xml, language)
+            _schema.add("Rule", [entry.id], entry)
+            _schema.add("Rule", [entry.label], entry)
+            continue
+
+        # Section lookup tables
+        section = Section.from_xml(xml, language)
+        _schema.add("Section", [section.id], section)
+        parent_label = section.parent_label
+        _schema.add("Section", [section.label, str(parent_label)], section)
+
+        if parent_label is None:
+            _schema.root[section.label] = section 
+
+        # Dense index for bitmap encoding (ids interned as in the registry)
+        section_id = sys.intern(section.id)
+        bit = 1 << len(section_ids)
+        section_ids.append(section_id)
 
         # Section by entry
         for child in xml.iterchildren("section", "field"):
 
-            # Using a generic schema class for either section or field
-            entry = XML(child, language)
+            # Fields are wrapped once for both lookups, while child sections
+            # (which are registered separately) only need their label
+            if child.tag == "field":
+                entry = Field.from_xml(child, language)
+                _schema.add("Field", [entry.id], entry)
+                label = entry.label
+            else:
+                label = _label(child, language)
             
-            # Initializing lookup set if necessary 
-            _add_schema("entries", [entry.label], set(), unique = False)
+            # Adding to lookup sets
+            entry_sets[label].add(section_id)
+            entry_bits[label] |= bit
 
-            # Adding to lookup set
-            _get_schema("entries", [entry.label]).add(section.id)
+    # Entry lookup sets are read-only from here on
+    for label, ids in entry_sets.items():
+        _schema.entries[label] = frozenset(ids)
 
-            # Adding to field lists
-            if child.tag == "field":
-
-                # Field by id
-                field = Field(xml = child, language = language)
-                _add_schema("Field", [entry.id],  field)
+    _schema.entry_bits.update(entry_bits)
     
     # LOV lookup tables
-    for _, xml in etree.iterwalk(lov, tag = "table"):
+    for xml in lov.iter("table"):
 
-        entry = LOV(xml = xml, language = language)
-        _add_schema("LOV", [entry.id], entry)
-        _add_schema("LOV", [entry.label], entry)
+        entry = LOV.from_xml(xml, language)
+        _schema.add("LOV", [entry.id], entry)
+        _schema.add("LOV", [entry.label], entry)
     
-    # Ref table lookup tables 
-    for _, xml in etree.iterwalk(ref, tag = "table"):
-
-        entry = XML(xml, language)
+    # Ref tables come in two components (table and refTable, in that order)
+    # that are collected in a single pass (materialized first, as elements
+    # are moved into containers along the way)
+    containers = {}
 
-        # Generating arbitrary container to hold both table and refTable entries
-        container = etree.Element("container", **xml.attrib)
-        container.append(xml)
+    for xml in list(ref.iter("table", "refTable")):
 
-        _add_schema("Reference", [entry.id], container)
-        _add_schema("Reference", [entry.label], container)
+        id_ = xml.get("id")
 
-    # Adding second component of ref tables
-    for _, xml in etree.iterwalk(ref, tag = "refTable"):
+        # Generating arbitrary container to hold both table and refTable entries
+        if xml.tag == "table":
+            container = etree.Element("container", **xml.attrib)
+            container.append(xml)
+            containers[id_] = container
+            continue
 
-        entry = XML(xml, language)
-        container = _get_schema("Reference", [entry.id])
+        container = containers[id_]
         container.append(xml)
 
-        # And replace the placeholder container with a Reference element
-        table = Reference(xml = container, language = language)
-        _add_schema("Reference", [table.id], table, overwrite = True)
-        _add_schema("Reference", [table.label], table, overwrite = True)
-
-    # Data types
-    for _, xml in etree.iterwalk(cv, tag = "type"):
-
-        entry = Type(xml = xml, language = language)
-        _add_schema("Type", [entry.id], entry)
-        _add_schema("Type", [entry.label], entry)
-
-    # Rules
-    for _, xml in etree.iterwalk(cv, tag = "rule"):
-
-        entry = Rule(xml = xml, language = language)
-        _add_schema("Rule", [entry.id], entry)
-        _add_schema("Rule", [entry.label], entry)
+        table = Reference.from_xml(container, language)
+        _schema.add("Reference", [table.id], table)
+        _schema.add("Reference", [table.label], table)
 
 
 # ------------------------------------------------------------------------------
@@ -228,14 +352,36 @@ class Schema(type):
 
     def __call__(cls, *args, **kwargs):
 
-        # If xml provided, then initialize from that
+        # If xml provided, then initialize from that (same as XML.from_xml)
         if "xml" in kwargs:
-            return super(Schema, cls).__call__(*args, **kwargs)
+            return cls.from_xml(**kwargs)
+
+        if kwargs:
+            err = "{}() only takes schema ids or labels, use {}.from_xml(xml, "
+            err += "language) to wrap an element"
+            raise TypeError(err.format(cls.__name__, cls.__name__))
 
         # Otherwise, check schema
-        global _schema
+        return _schema.get(cls.__name__, args)
+
+# ----------------------------------------
+@functools.lru_cache(maxsize = None)
+def _language_keys(language):
+    """Attribute names for names and descriptions, shared by all wrappers"""
 
-        return _get_schema(cls.__name__, list(args))
+    return sys.intern(language + "Name"), sys.intern(language + "Description")
+
+# ----------------------------------------
+def _label(xml, language):
+    """Element name, or description if there is no name (interned)"""
+
+    name_key, description_key = _language_keys(language)
+
+    label = xml.get(name_key)
+    if label is None:
+        label = xml.get(description_key)
+
+    return sys.intern(label) if label is not None else None
 
 # ===============================================================================
 class XML(object):
@@ -244,16 +390,27 @@ class XML(object):
     well as a lookup classemethod.
     """
 
+    # Plain wrappers are created for every list/reference value, so kept
+    # without an instance dict (subclasses still get one for cached properties)
+    __slots__ = ("xml", "language", "_name_key", "_description_key", "label")
+
     # ----------------------------------------
     def __init__(self, xml, language="english"):
         self.xml = xml
         self.language = language
 
+        # Language specific attribute names
+        self._name_key, self._description_key = _language_keys(language)
+
+        # Label is used in most lookups and sort keys, so computed only once
+        self.label = _label(xml, language)
+
     # ----------------------------------------
     @classmethod
     def from_xml(cls, xml, language="english"):
 
-        return cls(cls.lookup(cls, keys), language)
+        # Bypassing Schema metaclass lookup
+        return type.__call__(cls, xml = xml, language = language)
 
     # ----------------------------------------
     # Basics
@@ -264,17 +421,11 @@ class XML(object):
 
     @property
     def name(self):
-        return self.xml.get(self.language + "Name")
+        return self.xml.get(self._name_key)
 
     @property
     def description(self):
-        return self.xml.get(self.language + "Description")
-
-    @property
-    def label(self):
-        name = self.name
-        description = self.description
-        return name if name is not None else description
+        return self.xml.get(self._description_key)
 
     @property
     def order(self):
@@ -301,12 +452,12 @@ class XML(object):
     # ----------------------------------------
     # Parent/child related
 
+    # Plain property, as XML instances have no __dict__ to cache into
     @property
     def parent_label(self):
         parent = self.xml.getparent()
         if parent is not None:
-            parent = XML(parent, self.language)
-            return parent.label
+            return _label(parent, self.language)
 
     # ----------------------------------------
     # Helper functions for sorting
@@ -315,27 +466,26 @@ class XML(object):
         lst = lst.copy()
 
         if sort == "alpha":
-            lst.sort(key = lambda x: locale.strxfrm(x.label))
+            lst.sort(key = lambda x: _strxfrm(x.label))
         elif sort == None:
             pass
         else:
             lst.sort(key = lambda x: getattr(x, sort))
 
         if value is not None:
-            lst = [getattr(item, value) for item in lst]
+            lst = list(map(operator.attrgetter(value), lst))
 
         return lst
 
     def to_dict(lst, key, value = None):
 
+        # Built from iterables to keep per item work in C
+        keys = map(operator.attrgetter(key), lst)
+
         if value is None:
-            get = lambda x: x
+            return dict(zip(keys, lst))
         else:
-            get = lambda x: getattr(x, value)
-
-        out = {getattr(item, key):get(item) for item in lst}
-
-        return out
+            return dict(zip(keys, map(operator.attrgetter(value), lst)))
 
 # ===============================================================================
 class Type(XML, metaclass = Schema):
@@ -343,6 +493,24 @@ class Type(XML, metaclass = Schema):
     A generic data type.
     """
 
+    # Value element attributes for the basic types
+    _basic_types = {
+        "Year": {"format": "yyyy", "type": "Year"},
+        "Year Month": {"format": "yyyy/MM", "type": "Year Month"},
+        "Month Day": {"format": "MM/dd", "type": "Month Day"},
+        "Date": {"format": "yyyy-MM-dd", "type": "Date"},
+        "String": {"type": "String"},
+        "Integer": {"type": "Number"},
+    }
+
+    # Format hints for the date types
+    _prompts = {
+        "Year": "yyyy",
+        "Year Month": "yyyy/mm",
+        "Month Day": "mm/dd",
+        "Date": "yyyy-mm-dd",
+    }
+
     def __init__(self, *args, xml = None, language = "english"):
 
         super().__init__(xml, language)
@@ -351,88 +519,86 @@ class Type(XML, metaclass = Schema):
     @property
     def prompt(self):
 
-        prompts = {
-            "Year": "yyyy",
-            "Year Month": "yyyy/mm",
-            "Month Day": "mm/dd",
-            "Date": "yyyy-mm-dd",
-        }
-
-        if self.label in prompts:
-            return prompts[self.label]
-        else:
-            return ""
+        return self._prompts.get(self.label, "")
 
     # ----------------------------------------
     def to_xml(self, value):
 
-        # Coding out the basic types
-        label = self.label
-
-        basic_types = {
-            "Year": etree.Element("value", format="yyyy", type=label),
-            "Year Month": etree.Element("value", format="yyyy/MM", type=label),
-            "Month Day": etree.Element("value", format="MM/dd", type=label),
-            "Date":etree.Element("value", format="yyyy-MM-dd", type=label),
-            "String":etree.Element("value", type=self.label),
-            "Integer":etree.Element("value", type="Number"),
-        }
-
         # Removing all single newlines
         if isinstance(value, str):
-            value = re.sub("[ \t]*\n{1}[ \t]*", " ", value)
+            value = _RE_NEWLINE.sub(" ", value)
 
-        if self.label in basic_types:
+        to_xml = self._converters.get(self.label)
 
-            elem = basic_types[self.label]
-            elem.text = str(value)
-        
-        elif self.label == "Bilingual":
-
-            if isinstance(value, str):
-                value_dct = {"english":"", "french":""}
-                value_dct[self.language] = value
-            elif isinstance(value, dict):
-                value_dct = value
-            else:
-                err = "Bilingual data type value must be a string or dictionary."
-                raise SchemaError(err)
-
-            if "english" not in value_dct:
-                value_dct["english"] = ""
+        if to_xml is None:
+            err = '"{}" is not a known data type, something went wrong'
+            err = err.format(self.label)
+            raise SchemaError(err)
 
-            if "french" not in value_dct:
-                value_dct["french"] = ""
+        return to_xml(self, value)
 
-            elem = etree.Element("value", type="Bilingual")
+    # ----------------------------------------
+    def _basic_to_xml(self, value):
 
-            elem.append(etree.Element("english"))
-            elem[0].text = str(value_dct["english"])
-            elem[0].text = re.sub("[ \t]*\n{1}[ \t]*", " ", elem[0].text)
+        elem = etree.Element("value", **self._basic_types[self.label])
+        elem.text = str(value)
 
-            elem.append(etree.Element("french"))
-            elem[1].text = str(value_dct["french"])
-            elem[1].text = re.sub("[ \t]*\n{1}[ \t]*", " ", elem[1].text)
+        return elem
 
-        elif self.label in ["Datetime", "Pubmed", "Elapsed-Time"]:
+    # ----------------------------------------
+    def _bilingual_to_xml(self, value):
 
-            err = '"{}" type is not currently supported'.format(self.label)
+        if isinstance(value, str):
+            value_dct = {"english":"", "french":""}
+            value_dct[self.language] = value
+        elif isinstance(value, dict):
+            value_dct = value
+        else:
+            err = "Bilingual data type value must be a string or dictionary."
             raise SchemaError(err)
 
-        elif self.label in ["LOV", "Reference"]:
+        if "english" not in value_dct:
+            value_dct["english"] = ""
 
-            err = '"{}" should not have entered here, something went wrong'
-            err = err.format(self.label)
-            raise SchemaError(err)
+        if "french" not in value_dct:
+            value_dct["french"] = ""
 
-        else: 
+        elem = etree.Element("value", type="Bilingual")
 
-            err = '"{}" is not a known data type, something went wrong'
-            err = err.format(self.label)
-            raise SchemaError(err)
+        english = etree.SubElement(elem, "english")
+        english.text = str(value_dct["english"])
+        english.text = _RE_NEWLINE.sub(" ", english.text)
+
+        french = etree.SubElement(elem, "french")
+        french.text = str(value_dct["french"])
+        french.text = _RE_NEWLINE.sub(" ", french.text)
 
         return elem
 
+    # ----------------------------------------
+    def _unsupported_to_xml(self, value):
+
+        err = '"{}" type is not currently supported'.format(self.label)
+        raise SchemaError(err)
+
+    # ----------------------------------------
+    def _lookup_to_xml(self, value):
+
+        err = '"{}" should not have entered here, something went wrong'
+        err = err.format(self.label)
+        raise SchemaError(err)
+
+    # Conversion method for each type label
+    _converters = {
+        **dict.fromkeys(_basic_types, _basic_to_xml),
+        "Bilingual": _bilingual_to_xml,
+        "Datetime": _unsupported_to_xml,
+        "Pubmed": _unsupported_to_xml,
+        "Elapsed-Time": _unsupported_to_xml,
+        "LOV": _lookup_to_xml,
+        "Reference": _lookup_to_xml,
+    }
+
 # ===============================================================================
 class ReferenceType(XML, metaclass = Schema):
     """
@@ -447,14 +613,20 @@ class ReferenceType(XML, metaclass = Schema):
         super().__init__(xml, language)
 
     # ----------------------------------------
-    @property
+    @_cached_property
     def prompt(self):
 
-        out = XML.to_list(self.values_list, "label")
-        return "One of: " + ", ".join(out)
+        return "One of: " + ", ".join(self.labels)
+
+    # ----------------------------------------
+    @_cached_property
+    def labels(self):
+        """Value labels in alphabetical order (sorted once per table)"""
+
+        return XML.to_list(self.values_list, "label")
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def values(self):
         
         return XML.to_dict(self.values_list, "label")
@@ -478,16 +650,12 @@ class LOV(ReferenceType, metaclass = Schema):
     """
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def values_list(self):
 
-        values = []
+        language = self.language
 
-        for child in self.xml.getchildren():
-            entry = XML(child, self.language)
-            values.append(entry)
-
-        return values
+        return [XML(child, language) for child in self.xml]
 
     # ----------------------------------------
     def to_xml(self, value):
@@ -499,6 +667,14 @@ class LOV(ReferenceType, metaclass = Schema):
 
         return elem
 
+# -------------------------------------------------------------------------------
+class _ReferenceValue(XML):
+    """
+    A Reference value along with the ids and values of the tables it links to.
+    """
+
+    __slots__ = ("ids", "values")
+
 # -------------------------------------------------------------------------------
 class Reference(ReferenceType, metaclass = Schema):
     """
@@ -507,73 +683,71 @@ class Reference(ReferenceType, metaclass = Schema):
     """
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def values_list(self):
 
-        values = {}
+        # Binding to local as this is called for thousands of values
+        language = self.language
 
         # Initializing the values as simple XML elements around names
-        for child in self.xml.xpath("refTable/value"):
-            entry = XML(child, self.language)
-            values[entry.id] = entry
+        values = {
+            child.get("id"): _ReferenceValue(child, language)
+            for child in self.xml.find("refTable").iterchildren("value")
+        }
 
         # However, this simple set of values has a reference table attached
         # to it in the final XML table, which requires a set of reference
         # ids and a set of reference names
 
-        # The RefOrLovId slots in the final table
-        # correspond to the ids referenced in the first couple lines of values
+        # The RefOrLovId slots in the final table correspond to the ids
+        # referenced in the first couple lines of values (with id of -1),
+        # the remaining values form a lookup table for the fields that follow
         table_ids = []
-        
-        for child in self.xml.xpath("table/value"):
-            
-            entry = XML(child, self.language)
-            
-            if entry.id != "-1":
-                break
+        lookup = {}
 
-            label_type = re.sub(".*?\((.*?)\).*", r"\1", entry.label)
-            label = re.sub("[ ]*\(.*?\)", "", entry.label)
-            
-            if label_type == "List Of Values":
-                entry = LOV(label)
-            elif label_type == "Reference Table":
-                entry = Reference(label)
+        values_list = []
+        append = values_list.append
 
-            # But all we want is the id
-            table_ids.append(entry.id)
+        for child in self.xml.find("table"):
 
-        # The final id is the id of this active Reference
-        table_ids.append(self.id)
+            if child.tag == "value":
 
-        # And the values of the table are split up into two parts,
-        # the values themselves and a lookup table, so start by reading
-        # off the lookup table
+                # Only the id and label are needed, so no wrapper
+                id_ = child.get("id")
+                label = _label(child, language)
+                lookup[id_] = label
 
-        lookup = {}
-        
-        for child in self.xml.xpath("table/value"):
+                if id_ != "-1":
+                    continue
 
-            entry = XML(child, self.language)
-            lookup[entry.id] = entry.label
+                label_type = _RE_LABEL_TYPE.sub(r"\1", label)
+                label = _RE_LABEL_STRIP.sub("", label)
+                
+                if label_type == "List Of Values":
+                    id_ = LOV(label).id
+                elif label_type == "Reference Table":
+                    id_ = Reference(label).id
 
-        values_list = []
+                # But all we want is the id
+                table_ids.append(id_)
 
-        # Then go through the tables and convery ids to labels
-        for i, child in enumerate(self.xml.xpath("table/field")):
+            elif child.tag == "field":
 
-            table_values = [lookup[i.get("id")] for i in child.getchildren()]
+                # Go through the table and convert ids to labels
+                table_values = [lookup[i.get("id")] for i in child]
 
-            # And finally tack on this list of values (and previous ids)
-            # to the original XML entry
-            entry = XML(child, self.language)
-            
-            entry = values[entry.id]
-            entry.ids = table_ids
-            entry.values = table_values
+                # And finally tack on this list of values (and previous ids)
+                # to the original XML entry
+                entry = values[child.get("id")]
+                entry.ids = table_ids
+                entry.values = table_values
+
+                # And store this element in a final list
+                append(entry)
 
-            # And store this element in a final list
-            values_list.append(entry)
+        # The final id is the id of this active Reference (the list is
+        # shared by all values)
+        table_ids.append(self.id)
 
         return values_list
 
@@ -582,20 +756,21 @@ class Reference(ReferenceType, metaclass = Schema):
 
         value = self.get_value(value)
 
+        # The final link is to the value itself (without modifying the
+        # stored list of values)
         ids = value.ids 
-        values = value.values
-        values.append(value.label)
+        values = value.values + [value.label]
 
         elem = etree.Element("refTable", refValueId = value.id)
 
-        for i in range(len(ids)):
-            link = etree.Element(
+        for id_, link_value in zip(ids, values):
+            etree.SubElement(
+                elem,
                 "linkedWith",
                 label="x",
-                value=values[i],
-                refOrLovId=ids[i],
+                value=link_value,
+                refOrLovId=id_,
             )
-            elem.append(link)
 
         return elem
 
@@ -611,26 +786,64 @@ class Section(XML, metaclass = Schema):
     @classmethod
     def from_entries(cls, entries, error = True):
 
-        # Parsing fields in alphabetical order for consistency
-        entries.sort()
+        # Matching is independent of entry order, so cached on a frozenset
+        ids, matched, total = cls._match_entries(frozenset(entries))
 
-        # First, check if the full set of fields has been previously stored
-        name = "".join(entries)
+        if matched == 0:
+            return None
 
-        # If we are only looking up by 1 field, add some qualifiers
-        if len(entries) == 1:
-            name = name + "--"
-        
-        try:
-            return _get_schema("Section", [name])
-        except SchemaError:
-            pass
+        if len(ids) > 1:
+            
+            if error:
+                msg = 'Multiple sections matched with the same entries'
+                raise SchemaError(msg)
+
+            return None
+
+        section = cls(next(iter(ids)))
+
+        # Issue an error
+        if error and matched < total:
+            msg = '"{}" section matched with {} of {} entries'
+            msg = msg.format(section.label, matched, total)
+            raise SchemaError(msg)
+
+        return section
+
+    # ----------------------------------------
+    @classmethod
+    @functools.lru_cache(maxsize = 4096)
+    def _match_entries(cls, entries):
+        """
+        Identify the section ids matching the most entries (returned as a tuple
+        of section ids, number of entries matched and total number of matches).
+        """
+
+        lookup = _schema.entries
+        bits = _schema.entry_bits
+
+        # Common case: every entry is known and some section holds them all,
+        # in which case those sections are the best match without clustering
+        if entries and all(entry in bits for entry in entries):
+
+            # With sections encoded as bits, each intersection is a single &
+            # (giving up as soon as nothing is left)
+            common = -1
+
+            for entry in entries:
+                common &= bits[entry]
+                if not common:
+                    break
+
+            if common:
+                return _schema.ids_from_bits(common), len(entries), len(entries)
+
+        # Parsing fields in alphabetical order for consistency
+        entries = sorted(entries)
 
         numbers = [0]
         sets = [set()]
 
-        lookup = _schema["entries"] 
-
         for entry in entries:
             if entry not in lookup:
                 continue
@@ -653,55 +866,24 @@ class Section(XML, metaclass = Schema):
                 numbers.append(1)
 
         # Picking off set with most fields
-        if max(numbers) == 0:
-            return None
-
         index = numbers.index(max(numbers))
 
-        if len(sets[index]) > 1:
-            
-            if error:
-                msg = 'Multiple sections matched with the same entries'
-                raise SchemaError(msg)
-
-            return None
-
-        section = cls(list(sets[index])[0])
-
-        # Issue an error
-        if error and len(numbers) > 2:
-            msg = '"{}" section matched with {} of {} entries'
-            msg = msg.format(section.label, numbers[index], sum(numbers))
-            raise SchemaError(msg)
-
-        # Store to cache
-        _add_schema("Section", [name], section)
-
-        return section
+        return frozenset(sets[index]), numbers[index], sum(numbers)
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def parent_list(self):
 
-        parents = []
-
-        for parent in self.xml.iterancestors(tag = "section"):
-            section = Section(parent.get("id"))
-            parents.append(section)
+        # Nearest parent first
+        ids = reversed(_XPATH_PARENT_IDS(self.xml))
 
-        return parents
+        return [_schema.by_id("Section", id_) for id_ in ids]
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def parents(self):
 
-        parents = {}
-
-        for parent in self.xml.iterancestors(tag = "section"):
-            section = Section(parent.get("id"))
-            parents[section.label] = section
-
-        return parents
+        return {section.label: section for section in self.parent_list}
 
     # ----------------------------------------
     @property
@@ -715,86 +897,101 @@ class Section(XML, metaclass = Schema):
             return parent_list[0]
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def sections(self):
 
         children = {}
 
         for child in self.xml.iterchildren(tag = "section"):
-            section = Section(child.get("id"))
+            section = _schema.by_id("Section", child.get("id"))
             children[section.label] = section
 
         return children
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def fields(self):
 
         children = {}
 
         for child in self.xml.iterchildren(tag = "field"):
-            field = Field(child.get("id"))
+            field = _schema.by_id("Field", child.get("id"))
             children[field.label] = field
 
         return children
 
     # ----------------------------------------
-    @cached_property
-    def rules(self):
+    @_cached_property
+    def field_list(self):
+        """Fields in schema order"""
 
-        rules = []
+        return tuple(XML.to_list(list(self.fields.values()), sort = "order"))
 
-        for child in self.xml.iterchildren(tag = "constraint"):
-            rule = Rule.from_id(child.get("validatorRule"))
-            rule._parameters = child.get("parameters")
-            rules.append(rule)
+    # ----------------------------------------
+    @_cached_property
+    def section_list(self):
+        """Subsections in schema order"""
+
+        return tuple(XML.to_list(list(self.sections.values()), sort = "order"))
+
+    # ----------------------------------------
+    @_cached_property
+    def rules(self):
 
-        return rules
+        return Rule.from_constraints(self.xml)
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def sorting(self):
 
+        attrib = self.xml.attrib
         sorting = []
 
-        i = 1
-        while True:
-            field = self.xml.get("sortOnField" + str(i))
-            direction = self.xml.get("sortOnFieldDirection" + str(i))
-            i += 1
-            if field is not None:
-                field = Field(field)
-                direction.lower()
-                sorting.append((field.label, direction))
-            else:
-                break
+        # Sort fields are numbered (sortOnField1, sortOnField2, ...), each with
+        # a matching sortOnFieldDirection attribute
+        for key, id_ in attrib.items():
+
+            i = key[11:]
+            if not key.startswith("sortOnField") or not i.isdigit():
+                continue
+
+            field = _schema.by_id("Field", id_)
+            direction = attrib.get("sortOnFieldDirection" + i)
+            sorting.append((int(i), field.label, direction))
 
-        return sorting
+        sorting.sort()
+
+        return [(label, direction) for _, label, direction in sorting]
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def is_dependent(self):
         """True if any parent section has fields"""
 
-        for key in self.parents:
-            if len(self.parents[key].fields) > 0:
-                return True
+        # Deferring to the (cached) answer of the nearest parent section, so
+        # each ancestor chain is only checked once across the schema
+        parent = next(self.xml.iterancestors(tag = "section"), None)
+
+        if parent is None:
+            return False
 
-        return False
+        parent = _schema.by_id("Section", parent.get("id"))
+
+        return parent.has_fields or parent.is_dependent
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def is_container(self):
         """True if neither this section nor parent sections have fields"""
 
-        if len(self.fields) > 0:
-            return False
+        return not self.has_fields and not self.is_dependent
 
-        for key in self.parents:
-            if len(self.parents[key].fields) > 0:
-                return False
+    # ----------------------------------------
+    @_cached_property
+    def has_fields(self):
+        """True if this section has fields (without building the fields dict)"""
 
-        return True
+        return next(self.xml.iterchildren(tag = "field"), None) is not None
 
     # ----------------------------------------
     def field(self, label):
@@ -822,9 +1019,6 @@ class Section(XML, metaclass = Schema):
     # ----------------------------------------
     def template(self, path = None, **kwargs):
 
-        global _wrapper
-        wrapper = copy.deepcopy(_wrapper)
-
         # Unpacking kwargs
         defaults = {
             "indent_level": 0,
@@ -841,46 +1035,60 @@ class Section(XML, metaclass = Schema):
         prefix1 = ""
         prefix2 = "# "
 
-        # All subsequent lines are comments
-        wrapper.initial_indent = indent1 * indent + prefix1
-        wrapper.subsequent_indent = indent2 * indent + prefix2
-
         lines = []
 
-        for field in XML.to_list(list(self.fields.values()), sort = "order"):
+        # Sections are traversed depth-first with an explicit stack, with the
+        # header of each subsection written out at the level of its parent
+        stack = [(self, indent, False)]
 
-            line = "# [Description] " + field.description
-            lines.extend(wrapper.wrap(line))
+        while len(stack) > 0:
 
-            line = "# [Type] " + field.type.label
-                
-            if field.type.prompt != "":
-                line = line + " -- " + field.type.prompt
+            section, level, header = stack.pop()
 
-            if field.reference is not None:
-                line = line + " -- " + field.reference.prompt
+            if header:
+                wrapper = _indented(
+                    _wrapper,
+                    indent1 * (level - 1) + prefix1,
+                    indent2 * (level - 1) + prefix2,
+                )
+
+                line = section.label + ":"
+                lines.extend(wrapper.wrap(line))
+                lines[-1] = lines[-1] + "\n"
+
+            # All subsequent lines are comments
+            wrapper = _indented(
+                _wrapper,
+                indent1 * level + prefix1,
+                indent2 * level + prefix2,
+            )
 
-            lines.extend(wrapper.wrap(line))
+            for field in section.field_list:
 
-            for rule in field.rules:
-                line = "# [Constraint] " + rule.prompt
+                line = "# [Description] " + field.description
                 lines.extend(wrapper.wrap(line))
 
-            line = field.label + ":"
-            lines.extend(wrapper.wrap(line))
-            lines[-1] = lines[-1] + "\n"
+                line = "# [Type] " + field.type.label
+                    
+                if field.type.prompt != "":
+                    line = line + " -- " + field.type.prompt
 
-        for section in XML.to_list(list(self.sections.values()), sort = "order"):
+                if field.reference is not None:
+                    line = line + " -- " + field.reference.prompt
 
-            line = section.label + ":"
-            lines.extend(wrapper.wrap(line))
-            lines[-1] = lines[-1] + "\n"
+                lines.extend(wrapper.wrap(line))
 
-            lines.extend(
-                section.template(
-                    path = None, indent_level = indent + 1, join = False
-                )
-            )
+                for rule in field.rules:
+                    line = "# [Constraint] " + rule.prompt
+                    lines.extend(wrapper.wrap(line))
+
+                line = field.label + ":"
+                lines.extend(wrapper.wrap(line))
+                lines[-1] = lines[-1] + "\n"
+
+            # Reversed so that subsections are popped off in order
+            for subsection in reversed(section.section_list):
+                stack.append((subsection, level + 1, True))
 
         joined = "\n".join(lines)
 
@@ -903,10 +1111,8 @@ class Root():
 
     def __init__(self):
 
-        global _schema
-
         self.parents = {}
-        self.sections = _schema["Root"]
+        self.sections = _schema.root
         self.fields = {}
 
         nsmap = {
@@ -941,60 +1147,77 @@ class Field(XML, metaclass = Schema):
         return section.field(label)
 
     # ----------------------------------------
-    @property
+    @_cached_property
     def type(self):
         return Type(self.type_id)
 
     # ----------------------------------------
-    @property
+    @_cached_property
     def reference(self):
 
+        type_label = self.type.label
+
+        if type_label != "LOV" and type_label != "Reference":
+            return None
+
         lookup = self.lookup_id if self.lookup_id is not None else self.label
         
-        if self.type.label == "LOV":
+        if type_label == "LOV":
             return LOV(lookup)
-        elif self.type.label == "Reference":
+        else:
             return Reference(lookup)
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def rules(self):
 
-        rules = []
-
-        for child in self.xml.iterchildren(tag = "constraint"):
-            rule = Rule.from_id(child.get("validatorRule"))
-            rule._parameters = child.get("parameters")
-            rules.append(rule)
-
-        return rules
+        return Rule.from_constraints(self.xml)
 
     # ----------------------------------------
     def validate(self, value, entries):
 
-        msgs = []
-
-        for rule in self.rules:
-            msg = rule.validate(value, entries)
-            if msg is not None:
-                msgs.append(msg)
+        msgs = [
+            msg for msg in (rule.validate(value, entries) for rule in self.rules)
+            if msg is not None
+        ]
 
         if len(msgs) > 0:
             return "; ".join(msgs)
 
     # ----------------------------------------
-    def to_xml(self, value):
-
-        field = etree.Element("field", id = self.id, label = self.label)
+    @_cached_property
+    def _value_to_xml(self):
+        """Value converter, which is fixed by type and reference"""
 
-        # Adding on the actual value based on type
         if self.reference is not None:
-            field.append(self.reference.to_xml(value))
+            return self.reference.to_xml
         else:
-            field.append(self.type.to_xml(value))
+            return self.type.to_xml
+
+    # ----------------------------------------
+    def _fill(self, field, value):
+
+        field.append(self._value_to_xml(value))
 
         return field
 
+    # ----------------------------------------
+    def to_xml(self, value):
+
+        field = etree.Element("field", id = self.id, label = self.label)
+
+        return self._fill(field, value)
+
+    # ----------------------------------------
+    def to_xml_into(self, parent, value):
+        """Same as to_xml, but created directly as a child of parent"""
+
+        field = etree.SubElement(
+            parent, "field", id = self.id, label = self.label
+        )
+
+        return self._fill(field, value)
+
     # ----------------------------------------
     def to_yaml(self, value, wrapper = _wrapper):
 
@@ -1013,9 +1236,11 @@ class Field(XML, metaclass = Schema):
 
             field = wrapper.wrap(self.label + ":")
 
-            wrapper = copy.deepcopy(wrapper)
-            wrapper.initial_indent += _wrapper.initial_indent
-            wrapper.subsequent_indent += _wrapper.subsequent_indent
+            wrapper = _indented(
+                wrapper,
+                wrapper.initial_indent + _wrapper.initial_indent,
+                wrapper.subsequent_indent + _wrapper.subsequent_indent,
+            )
 
             field += Field.text_to_yaml("english", content["english"], wrapper)
             field += Field.text_to_yaml("french", content["french"], wrapper)
@@ -1034,11 +1259,10 @@ class Field(XML, metaclass = Schema):
         # If this results in multiple lines, then we need an extra indent
         if ( len(lines) > 1 ):
             lines = wrapper.wrap(header + ": >-")
-            wrapper = copy.deepcopy(wrapper)
 
             # Blanking out indents to make sure there are no list dashes
-            wrapper.initial_indent = " " * (len(wrapper.initial_indent) + 2)
-            wrapper.subsequent_indent = " " * (len(wrapper.initial_indent) + 2)
+            indent = " " * (len(wrapper.initial_indent) + 2)
+            wrapper = _indented(wrapper, indent, " " * (len(indent) + 2))
             lines = lines + wrapper.wrap(content)
 
         return lines
@@ -1054,18 +1278,39 @@ class Rule(XML):
 
         super().__init__(xml, language)
 
+        # Rules are dispatched on their numeric id
+        self._id_int = int(self.id)
+
     # ----------------------------------------
     @classmethod
-    def from_id(cls, id_):
+    @functools.lru_cache(maxsize = None)
+    def from_id(cls, id_, parameters = None):
+        """Copy of rule with parameters (cached as many constraints repeat)"""
+
+        # Shallow copy shares the (read-only) schema element
+        rule = copy.copy(_schema.get(cls.__name__, [id_]))
+        rule._parameters = parameters
 
-        return copy.deepcopy(_get_schema(cls.__name__, [id_]))
+        return rule
+
+    # ----------------------------------------
+    @classmethod
+    def from_constraints(cls, xml):
+        """Rules for the constraint children of a section or field element"""
+
+        from_id = cls.from_id
+
+        return tuple(
+            from_id(child.get("validatorRule"), child.get("parameters"))
+            for child in xml.iterchildren(tag = "constraint")
+        )
 
     # ----------------------------------------
-    @cached_property
+    @_cached_property
     def parameters(self):
 
         par = self._parameters
-        id_ = int(self.id)
+        id_ = self._id_int
 
         if id_ == 8 or id_ == 18:
 
@@ -1075,21 +1320,22 @@ class Rule(XML):
             # Requires parsing parameters
             lines = par.split(";")
 
-            field_id = re.sub(":.*", "", lines[1])
-            field = Field(field_id)
+            field_id = lines[1].partition(":")[0]
+            field = _schema.by_id("Field", field_id)
 
-            lov_id = re.sub(":.*", "", lines[2])
-            lov = LOV(lov_id)
+            lov_id = lines[2].partition(":")[0]
+            lov = _schema.by_id("LOV", lov_id)
 
+            # Only one value is needed, so no point in building an id lookup
             other_id = lines[-1]
-            other = XML.to_dict(lov.values_list, "id")[other_id]
+            other = next(x for x in lov.values_list if x.id == other_id)
 
             out = {
                 "field":field.label,
                 "value":other.label,
             }
 
-            op = re.sub(":.*", "", lines[-2])
+            op = lines[-2].partition(":")[0]
             if int(op) == 359:
                 out["is"] = True 
                 out["op"] = operator.eq
@@ -1103,8 +1349,8 @@ class Rule(XML):
         
         elif id_ == 24:
             
-            field_id = re.sub(":.*", "", par)
-            field = Field(field_id)
+            field_id = par.partition(":")[0]
+            field = _schema.by_id("Field", field_id)
 
             return field.label
 
@@ -1112,88 +1358,130 @@ class Rule(XML):
     @property
     def prompt(self):
 
-        id_ = int(self.id)
+        # Only covering a fraction of the more common rules
+        prompt = self._prompts.get(self._id_int)
+
+        if prompt is None:
+            return '"{}" -- not currently checked'.format(self.label)
+
+        return prompt(self)
+
+    # ----------------------------------------
+    def validate(self, value, entries = None):
+
+        # Rules technically used but not implemented
+        # 15 -- Unclear
+        # 19 -- Unclear
+        # 25 -- PubMed
+        # 28 -- Birthday
 
         # Only covering a fraction of the more common rules
-        if id_ == 8:
+        validate = self._validators.get(self._id_int)
 
-            msg = "Must be fewer than {} characters long."
-            return msg.format(self.parameters)
-        
-        elif id_ == 11:
+        if validate is not None:
+            return validate(self, value, entries)
 
-            msg = "Must not be left blank."
-            return msg
+    # ----------------------------------------
+    # Prompts by rule
 
-        elif id_ == 18:
+    def _prompt_length(self):
 
-            msg = "Must have {} entries or fewer."
-            return msg.format(parameters)
+        msg = "Must be fewer than {} characters long."
+        return msg.format(self.parameters)
 
-        elif id_ == 20:
+    def _prompt_blank(self):
 
-            if self.parameters["is"]:
-                msg = "Required if {} is {}"
-            else:
-                msg = "Required if {} is not {}"
+        msg = "Must not be left blank."
+        return msg
 
-            pars = self.parameters
-            return  msg.format(pars["field"], pars["value"])
+    def _prompt_count(self):
 
-        elif id_ == 24:
-            
-            msg = "Mutually exclusive with {}."
-            return msg.format(self.parameters)
+        msg = "Must have {} entries or fewer."
+        return msg.format(self.parameters)
 
-        return '"{}" -- not currently checked'.format(self.label)
+    def _prompt_conditional(self):
+
+        if self.parameters["is"]:
+            msg = "Required if {} is {}"
+        else:
+            msg = "Required if {} is not {}"
+
+        pars = self.parameters
+        return  msg.format(pars["field"], pars["value"])
+
+    def _prompt_exclusive(self):
+
+        msg = "Mutually exclusive with {}."
+        return msg.format(self.parameters)
 
     # ----------------------------------------
-    def validate(self, value, entries = None):
+    # Checks by rule
 
-        # Rules technically used but not implemented
-        # 15 -- Unclear
-        # 19 -- Unclear
-        # 25 -- PubMed
-        # 28 -- Birthday
+    def _check_length(self, value):
 
-        id_ = int(self.id)
+        if len(value) > self.parameters:
+            return "too long"
 
-        # Only covering a fraction of the more common rules
-        if id_ == 8:
+    def _check_blank(self, value):
 
-            if len(value) > self.parameters:
-                return "too long"
-        
-        elif id_ == 11:
+        if len(value) == 0:
+            return "null entries not allowed"
 
-            if len(value) == 0:
-                return "null entries not allowed"
+    def _check_count(self, value):
 
-        elif id_ == 18:
+        if len(value) > self.parameters:
+            return "too many entries"
 
-            if len(value) > self.parameters:
-                return "too many entries"
+    def _validate_value_only(self, value, entries):
 
-        elif id_ == 20:
+        # These only depend on the value itself
+        return self._checks[self._id_int](self, value)
 
-            # This rule has two parts: the virst part asks if the value is nil
-            # The second asks whether another value is something or not
-            # The error is parsed accordingly
-            pars = self.parameters
-            test = pars["op"](entries[pars["field"]], pars["value"])
+    def _validate_conditional(self, value, entries):
 
-            if len(value) == 0 and test:
-                err = pars["err"]
-                err = err.format(pars["field"], pars["value"])
-                return err
+        # This rule has two parts: the virst part asks if the value is nil
+        # The second asks whether another value is something or not
+        # The error is parsed accordingly
+        pars = self.parameters
+        test = pars["op"](entries[pars["field"]], pars["value"])
 
-        elif id_ == 24:
+        if len(value) == 0 and test:
+            err = pars["err"]
+            err = err.format(pars["field"], pars["value"])
+            return err
 
-            # Requires parsing parameters
-            if len(entries[self.parameters]) > 0 and len(value) > 0:
-                err = 'must be left blank if using "{}"'
-                err = err.format(self.parameters)
-                return err
+    def _validate_exclusive(self, value, entries):
+
+        # Requires parsing parameters
+        if len(entries[self.parameters]) > 0 and len(value) > 0:
+            err = 'must be left blank if using "{}"'
+            err = err.format(self.parameters)
+            return err
+
+    # ----------------------------------------
+    # Dispatch tables keyed on rule id
+
+    _prompts = {
+        8: _prompt_length,
+        11: _prompt_blank,
+        18: _prompt_count,
+        20: _prompt_conditional,
+        24: _prompt_exclusive,
+    }
+
+    _checks = {
+        8: _check_length,
+        11: _check_blank,
+        18: _check_count,
+    }
+
+    _validators = {
+        8: _validate_value_only,
+        11: _validate_value_only,
+        18: _validate_value_only,
+        20: _validate_conditional,
+        24: _validate_exclusive,
+    }
 
 # Generating default schema
 load_schema()
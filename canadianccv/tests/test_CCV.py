@@ -1,11 +1,14 @@
 import logging
 from lxml import etree
 import os
+import re
+import tempfile
 from unittest import TestCase
 import warnings
 
 import canadianccv
 from canadianccv import CCV, Section, _schema
+from canadianccv.ccv import _parse_toml, _toml_dates
 
 log = logging.getLogger("CCV")
 log.setLevel("CRITICAL")
@@ -14,19 +17,38 @@ class TestCCV(TestCase):
 
     ccv = CCV()
 
+    def setUp(self):
+
+        # Output files are kept out of the working directory
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def read_xml(self, ccv):
+        """XML output without the generation timestamp"""
+
+        ccv.to_xml(self.path("test.xml"))
+
+        f = open(self.path("test.xml"))
+        with f:
+            text = f.read()
+
+        return re.sub('dateTimeGenerated="[^"]*"', "", text)
+
     def cycle_yaml(self, text):
         """All tests essentially boil down to ensuring import is consistent."""
 
+        yaml_path = self.path("test.yaml")
+
         # First cycle
         self.ccv.add_yaml(text)
-        self.ccv.to_yaml("test.yaml")
-        self.ccv.to_xml("test.xml")
+        self.ccv.to_yaml(yaml_path)
 
-        f = open("test.xml")
-        with f:
-            first = f.read()
+        first = self.read_xml(self.ccv)
 
-        f = open("test.yaml")
+        f = open(yaml_path)
         with f:
             yaml = f.read()
 
@@ -34,12 +56,9 @@ class TestCCV(TestCase):
 
         # Second cycle
         self.ccv = CCV()
-        self.ccv.add_file("test.yaml")
-        self.ccv.to_xml("test.xml")
+        self.ccv.add_file(yaml_path)
 
-        f = open("test.xml")
-        with f:
-            second = f.read()
+        second = self.read_xml(self.ccv)
 
         assert first == second
 
@@ -99,3 +118,86 @@ class TestCCV(TestCase):
         """
 
         self.cycle_yaml(text)
+
+    def test_toml(self):
+
+        yaml = """
+        Course Code: Test 1000
+        Course Title: CCV Test
+        Course Level: Undergraduate
+        Start Date: 2000-01-01
+        Role: Professor
+        Organization: Dalhousie University
+        """
+
+        toml = """
+        "Course Code" = "Test 1000"
+        "Course Title" = "CCV Test"
+        "Course Level" = "Undergraduate"
+        "Start Date" = 2000-01-01
+        "Role" = "Professor"
+        "Organization" = "Dalhousie University"
+        """
+
+        ccv = CCV()
+        ccv.add_yaml(yaml)
+        expected = self.read_xml(ccv)
+
+        ccv = CCV()
+        ccv.add_toml(toml)
+
+        assert self.read_xml(ccv) == expected
+
+        # Files are picked up by extension when adding a directory
+        directory = self.path("entries")
+        os.mkdir(directory)
+
+        f = open(os.path.join(directory, "course.toml"), "w")
+        with f:
+            f.write(toml)
+
+        f = open(os.path.join(directory, "ignored.txt"), "w")
+        with f:
+            f.write(toml)
+
+        ccv = CCV()
+        ccv.add_files(directory)
+
+        assert self.read_xml(ccv) == expected
+
+    def test_toml_dates(self):
+
+        text = """
+        date = 2000-01-01
+        datetime = 2000-01-01T10:20:30
+        time = 10:20:30
+        nested = {dates = [2000-01-01]}
+        """
+
+        assert _toml_dates(_parse_toml(text)) == {
+            "date": "2000-01-01",
+            "datetime": "2000-01-01T10:20:30",
+            "time": "10:20:30",
+            "nested": {"dates": ["2000-01-01"]},
+        }
+
+    def test_entry_order(self):
+        """Entries sharing an order index are written in schema order."""
+
+        keys = {
+            "Book Title": "A Book",
+            "Year": "2000",
+            "Editors": "Editor, Test",
+            "Identifier": "1234",
+        }
+
+        outputs = []
+        for order in [list(keys), list(reversed(keys))]:
+            ccv = CCV()
+            entries = {key: keys[key] for key in order}
+            ccv.add_content(entries, Section("Books"), validate = False)
+
+            outputs.append(self.read_xml(ccv))
+
+        assert outputs[0] == outputs[1]
+        assert outputs[0].index('"Editors"') < outputs[0].index('"Identifier"')
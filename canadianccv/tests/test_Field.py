@@ -54,3 +54,17 @@ class TestField(TestCase):
         id_ = field.reference.get_value("Dalhousie University").id
         assert int(id_) == 6544937977
 
+
+    def test_xml_keyword(self):
+
+        field = Field.from_section("Role", "Courses Taught")
+
+        # Wrapping an element directly is the same as from_xml
+        wrapped = Field(xml = field.xml, language = "french")
+
+        assert wrapped is not field
+        assert wrapped.id == field.id
+        assert wrapped.language == "french"
+
+        with self.assertRaises(TypeError):
+            Field(field.id, language = "french")
@@ -5,7 +5,7 @@ from unittest import TestCase
 import warnings
 
 import canadianccv
-from canadianccv import _schema, Section, XML
+from canadianccv import _schema, load_schema, Section, XML
 
 class TestSection(TestCase):
 
@@ -39,3 +39,61 @@ class TestSection(TestCase):
         assert course2 is course
 
         #print(course.yaml_template())
+
+    def test_partial_entries(self):
+
+        course = Section("Courses Taught")
+        entries = ["Course Code", "Course Title", "Book Title"]
+
+        # Best section is only reported as an error
+        with self.assertRaises(canadianccv.SchemaError):
+            Section.from_entries(entries)
+
+        assert Section.from_entries(entries, error = False) is course
+
+    def test_tied_entries(self):
+
+        course = Section("Courses Taught")
+
+        # Equally good matches go to the first entry (alphabetically)
+        for entries in [["Course Code", "Supervision Role"],
+                        ["Supervision Role", "Course Code"]]:
+
+            with self.assertRaises(canadianccv.SchemaError):
+                Section.from_entries(entries)
+
+            assert Section.from_entries(entries, error = False) is course
+
+        # Entries shared by several sections cannot be resolved
+        with self.assertRaises(canadianccv.SchemaError):
+            Section.from_entries(["Book Title"])
+
+        assert Section.from_entries(["Book Title"], error = False) is None
+
+    def test_count_rule(self):
+
+        # Sections like "Identification" are limited to a single entry
+        section = Section("2687e70e5d45487c93a8a02626543f64")
+        rules = [rule for rule in section.rules if int(rule.id) == 18]
+
+        assert len(rules) == 1
+        assert rules[0].prompt == "Must have 1 entries or fewer."
+        assert rules[0].validate(["a", "b"]) == "too many entries"
+
+    def test_reload(self):
+
+        def snapshot():
+            return (
+                sorted(_schema._exact),
+                {key: sorted(value) for key, value in _schema._partial.items()},
+                sorted(_schema.root), dict(_schema.entries),
+                dict(_schema.entry_bits), list(_schema.section_ids),
+            )
+
+        before = snapshot()
+
+        # Loading again starts from a clean registry
+        load_schema()
+
+        assert snapshot() == before
+        assert Section("Courses Taught").id == "9dc74140d0ff4b26a2d4a559bc9b5a2b"
@@ -44,3 +44,19 @@ class TestType(TestCase):
 
         assert ( XML.to_list(org.values_list, "label")[:2] ==
                 ['Aachen Technical University', 'Aalborg Universitet'])
+
+    def test_ref_to_xml(self):
+
+        org = Reference("Organization")
+        value = org.get_value("Dalhousie University")
+
+        ids = list(value.ids)
+        values = list(value.values)
+
+        # Repeated conversion leaves the stored value untouched
+        first = etree.tostring(org.to_xml(value.label))
+        second = etree.tostring(org.to_xml(value.label))
+
+        assert first == second
+        assert value.ids == ids
+        assert value.values == values